@@ -3,17 +3,127 @@
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.config import settings
-from app.services.pdf_service import PDFService
 from app.tasks.pdf_tasks import process_pdf_task
 import os
-import uuid
-from typing import Dict, Any
+import logging
+import copy
+import shutil
+import asyncio
+import secrets
+import hashlib
+import aiofiles
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 上传文件分块大小 (64KB)
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+# 分析结果缓存 (LRU)，键为 (文件SHA256, 模型, DPI)
+_result_cache: "OrderedDict[Tuple[str, str, int], Dict[str, Any]]" = OrderedDict()
+
+# 限制同时进行的PDF分析任务数量
+_processing_gate = asyncio.Semaphore(settings.MAX_CONCURRENT_TASKS)
+
+
+async def _save_upload_file(file: UploadFile, file_path: str) -> Tuple[str, int]:
+    """
+    分块将上传文件写入磁盘，避免将整个文件读入内存
+
+    Returns:
+        (文件内容的SHA256摘要, 文件大小)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(file_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.MAX_FILE_SIZE:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"文件大小超过限制 ({settings.MAX_FILE_SIZE / 1024 / 1024}MB)"
+                )
+            digest.update(chunk)
+            await buffer.write(chunk)
+    return digest.hexdigest(), size
+
+
+def _remove_file(file_path: str):
+    """
+    删除已上传的文件
+    """
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+
+def _get_cached_result(key: Tuple[str, str, int]) -> Dict[str, Any]:
+    """
+    查询分析结果缓存，命中时将其移到最近使用位置
+    """
+    result = _result_cache.get(key)
+    if result is not None:
+        _result_cache.move_to_end(key)
+    return result
+
+
+def _store_cached_result(key: Tuple[str, str, int], result: Dict[str, Any]):
+    """
+    写入分析结果缓存，超出容量时淘汰最久未使用的结果
+    """
+    _result_cache[key] = result
+    _result_cache.move_to_end(key)
+    while len(_result_cache) > settings.RESULT_CACHE_SIZE:
+        _result_cache.popitem(last=False)
+
+
+def _link_or_copy(src: str, dst: str):
+    """
+    优先硬链接文件，跨文件系统等不支持时回退为复制
+    """
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _clone_cached_result(cached: Dict[str, Any], file_id: str) -> Dict[str, Any]:
+    """
+    为本次上传复用缓存的分析结果
+
+    页面图像链接到本次上传自己的图像目录，file_id 与图像路径均指向本次上传，
+    不同上传之间不会共享同一个 file_id。
+    """
+    output_dir = os.path.join(settings.UPLOAD_DIR, "images", file_id)
+    os.makedirs(output_dir, exist_ok=True)
+    path_map = {}
+    try:
+        for src in cached["image_paths"]:
+            dst = os.path.join(output_dir, os.path.basename(src))
+            _link_or_copy(src, dst)
+            path_map[src] = dst
+    except OSError:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        raise
+    
+    result = copy.deepcopy(cached)
+    result["file_id"] = file_id
+    result["image_paths"] = [path_map[path] for path in cached["image_paths"]]
+    for page in result.get("ai_analysis", {}).get("page_results", []):
+        if page.get("image_path") in path_map:
+            page["image_path"] = path_map[page["image_path"]]
+    return result
+
 
 @router.post("/pdf")
 async def upload_pdf(
@@ -30,8 +140,8 @@ async def upload_pdf(
             detail="只支持PDF文件格式"
         )
     
-    # 验证文件大小
-    if file.size > settings.MAX_FILE_SIZE:
+    # 验证文件大小（客户端提供大小时提前拒绝，写入时仍会逐块校验）
+    if file.size is not None and file.size > settings.MAX_FILE_SIZE:
         raise HTTPException(
             status_code=400,
             detail=f"文件大小超过限制 ({settings.MAX_FILE_SIZE / 1024 / 1024}MB)"
@@ -39,53 +149,67 @@ async def upload_pdf(
     
     try:
         # 生成唯一文件名
-        file_id = str(uuid.uuid4())
+        file_id = secrets.token_hex(16)
         filename = f"{file_id}.pdf"
         file_path = os.path.join(settings.UPLOAD_DIR, filename)
         
-        # 确保上传目录存在
-        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        # 分块保存文件，同时计算文件摘要
+        file_hash, file_size = await _save_upload_file(file, file_path)
         
-        # 保存文件
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # 相同文件重复上传时直接复用已有分析结果
+        cache_key = (file_hash, settings.OLLAMA_MODEL, settings.PDF_DPI)
+        result = None
+        cached = _get_cached_result(cache_key)
+        if cached is not None:
+            try:
+                result = await run_in_threadpool(_clone_cached_result, cached, file_id)
+                logger.info("♻️ 命中分析结果缓存: %s", file_hash)
+            except OSError:
+                # 缓存结果的页面图像已不存在，丢弃该缓存并重新分析
+                _result_cache.pop(cache_key, None)
         
-        # 创建PDF服务实例并获取基本信息
-        pdf_service = PDFService()
-        pdf_info = pdf_service.get_pdf_info(file_path)
+        if result is None:
+            # 在线程池中处理PDF文件，避免阻塞事件循环
+            logger.info("🚀 开始处理PDF文件...")
+            async with _processing_gate:
+                result = await run_in_threadpool(process_pdf_task, file_id, file_path)
+            logger.info("✅ PDF处理完成")
+            
+            # 仅缓存完整成功的分析结果
+            if result.get("status") == "completed":
+                _store_cached_result(cache_key, result)
         
         # TODO: 保存到数据库
         # pdf_record = PDFDocument(
         #     id=file_id,
         #     filename=file.filename,
         #     file_path=file_path,
-        #     file_size=file.size,
-        #     page_count=pdf_info["page_count"],
+        #     file_size=file_size,
+        #     page_count=result["pdf_info"]["page_count"],
         #     status="uploaded"
         # )
         # db.add(pdf_record)
         # db.commit()
         
-        # 直接同步处理PDF文件
-        print(f"🚀 开始处理PDF文件...")
-        result = process_pdf_task(file_id, file_path)
-        print(f"✅ PDF处理完成")
-        
         return {
             "file_id": file_id,
             "filename": file.filename,
-            "file_size": file.size,
-            "page_count": pdf_info["page_count"],
+            "file_size": file_size,
+            "page_count": result["pdf_info"]["page_count"],
             "status": "completed",
             "message": "PDF文件上传并处理完成",
             "result": result
         }
         
+    except HTTPException:
+        # 清理已上传的文件
+        if 'file_path' in locals():
+            _remove_file(file_path)
+        raise
     except Exception as e:
         # 清理已上传的文件
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
+        if 'file_path' in locals():
+            _remove_file(file_path)
         
         raise HTTPException(
             status_code=500,
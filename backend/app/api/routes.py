@@ -3,10 +3,11 @@ API路由配置
 """
 
 from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse
 from app.api.endpoints import upload, results
 
-# 创建主路由器
-api_router = APIRouter()
+# 创建主路由器，使用orjson序列化响应
+api_router = APIRouter(default_response_class=ORJSONResponse)
 
 # 注册子路由
 api_router.include_router(upload.router, prefix="/upload", tags=["文件上传"])
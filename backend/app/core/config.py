@@ -2,6 +2,8 @@
 应用配置管理
 """
 
+import os
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from typing import List
 
@@ -22,6 +24,12 @@ class Settings(BaseSettings):
     # Ollama配置
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "qwen2.5vl:72b"
+    OLLAMA_CONCURRENCY: int = 4
+    OLLAMA_CACHE_DIR: str = ""  # 为空时使用 UPLOAD_DIR/ollama_cache
+    OLLAMA_CACHE_MAX_ENTRIES: int = 1000  # 响应缓存最多保留的条目数
+    OLLAMA_AVAILABILITY_TTL: int = 30  # 模型可用性检查结果缓存秒数
+    OLLAMA_KEEP_ALIVE: str = "2h"  # 模型在Ollama内存中的驻留时间
+    OLLAMA_WARMUP: bool = True  # 启动时预加载模型
     
     # 文件存储配置
     UPLOAD_DIR: str = "./uploads"
@@ -31,6 +39,11 @@ class Settings(BaseSettings):
     # PDF处理配置
     PDF_DPI: int = 300
     PDF_MAX_PAGES: int = 50
+    MAX_CONCURRENT_TASKS: int = 2
+    ENHANCE_MAX_WORKERS: int = 4  # 所有任务共享的图像增强线程数
+    
+    # 分析结果缓存配置
+    RESULT_CACHE_SIZE: int = 32
     
     # CORS配置
     ALLOWED_HOSTS: List[str] = ["http://localhost:3000", "http://127.0.0.1:3000"]
@@ -39,6 +52,13 @@ class Settings(BaseSettings):
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/1"
     
+    @model_validator(mode="after")
+    def _resolve_derived_paths(self) -> "Settings":
+        """未单独配置的目录从 UPLOAD_DIR 派生"""
+        if not self.OLLAMA_CACHE_DIR:
+            self.OLLAMA_CACHE_DIR = os.path.join(self.UPLOAD_DIR, "ollama_cache")
+        return self
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,23 @@
+"""
+日志配置
+"""
+
+import logging
+from app.core.config import settings
+
+# 日志格式：时间、级别、模块名
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+
+def setup_logging():
+    """
+    配置应用 (app.*) 日志，重复调用不会重复添加处理器
+
+    DEBUG 模式下输出逐页处理的调试信息，否则只输出 INFO 及以上级别。
+    """
+    app_logger = logging.getLogger("app")
+    if not app_logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        app_logger.addHandler(handler)
+    app_logger.setLevel(logging.DEBUG if settings.DEBUG else logging.INFO)
@@ -2,115 +2,65 @@
 Ollama AI模型服务
 """
 
+import re
+import logging
 import httpx
+import asyncio
 import base64
-import json
-from typing import Dict, Any, List, Optional
+import io
+import os
+import orjson
+import hashlib
+import secrets
+import time
+import threading
+import functools
+from typing import Dict, Any, List, Optional, Tuple
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
 
-class OllamaService:
-    """Ollama AI模型服务类"""
-    
-    def __init__(self):
-        self.base_url = settings.OLLAMA_BASE_URL
-        self.model = settings.OLLAMA_MODEL
-        self.timeout = 900  # 15分钟超时
-    
-    async def check_model_availability(self) -> bool:
-        """
-        检查模型是否可用
-        """
-        try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                # 使用 POST 方法检查模型是否可用
-                response = await client.post(
-                    f"{self.base_url}/api/show",
-                    json={"name": self.model}
-                )
-                if response.status_code == 200:
-                    return True
-                
-                # 如果 show 失败，回退到 tags 方法
-                response = await client.get(f"{self.base_url}/api/tags")
-                if response.status_code == 200:
-                    models = response.json().get("models", [])
-                    return any(model.get("name", "").startswith(self.model.split(":")[0]) 
-                             for model in models)
-                return False
-        except Exception:
-            return False
-    
-    def encode_image_to_base64(self, image_path: str) -> str:
-        """
-        将图像编码为base64字符串
-        """
-        try:
-            with open(image_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                return encoded_string
-        except Exception as e:
-            raise Exception(f"图像编码失败: {str(e)}")
-    
-    async def analyze_image(self, image_path: str, prompt: str = None) -> Dict[str, Any]:
-        """
-        分析图像并提取尺寸信息
-        """
-        try:
-            # 编码图像
-            image_base64 = self.encode_image_to_base64(image_path)
-            
-            # 默认提示词
-            if prompt is None:
-                prompt = self._get_default_prompt()
-            
-            # 构建请求数据
-            request_data = {
-                "model": self.model,
-                "prompt": prompt,
-                "images": [image_base64],
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,  # 降低随机性，提高准确性
-                    "top_p": 0.9,
-                    "top_k": 40
-                }
-            }
-            
-            # 发送请求
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    f"{self.base_url}/api/generate",
-                    json=request_data,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code != 200:
-                    raise Exception(f"Ollama API请求失败: {response.status_code}")
-                
-                result = response.json()
-                return {
-                    "success": True,
-                    "response": result.get("response", ""),
-                    "model": result.get("model", ""),
-                    "total_duration": result.get("total_duration", 0),
-                    "load_duration": result.get("load_duration", 0),
-                    "prompt_eval_count": result.get("prompt_eval_count", 0),
-                    "eval_count": result.get("eval_count", 0)
-                }
-                
-        except Exception as e:
-            return {
-                "success": False,
-                "error": str(e),
-                "response": ""
-            }
-    
-    def _get_default_prompt(self) -> str:
-        """
-        获取优化的尺寸识别提示词 - 支持表格和标注识别
-        """
-        return """你是专业的工程图纸分析专家。请识别图像中的所有尺寸标注信息，包括表格中的公差项目。
+# base64分块编码的读取大小，必须为3的倍数以保证各块编码可直接拼接
+ENCODE_CHUNK_SIZE = 3 * 65536
+
+# AI响应中markdown格式的JSON代码块
+_JSON_BLOCK_PATTERN = re.compile(r'```json\s*(\{.*?\})\s*```', re.DOTALL | re.IGNORECASE)
+_JSON_FENCE_START_PATTERN = re.compile(r'^```json\s*', re.MULTILINE)
+_JSON_FENCE_END_PATTERN = re.compile(r'\s*```$', re.MULTILINE)
+
+# 多种尺寸格式的正则表达式 (回退解析使用)
+# 第三项为该格式匹配时小写文本中必然出现的字符串之一，不包含时可跳过该次扫描
+_DIMENSION_PATTERNS = [
+    # 基本格式: 数字 + 单位 + 可选公差
+    (re.compile(r'(\d+\.?\d*)\s*(mm|cm|inch|in|″|′|°|um)\s*([±]\s*\d+\.?\d*)?', re.IGNORECASE), 'basic', None),
+
+    # 直径格式: Φ + 数字 + 单位
+    (re.compile(r'[ΦΦφ]\s*(\d+\.?\d*)\s*(mm|cm|inch|in)?', re.IGNORECASE), 'diameter', ('φ', 'ϕ')),
+
+    # 半径格式: R + 数字 + 单位
+    (re.compile(r'R\s*(\d+\.?\d*)\s*(mm|cm|inch|in)?', re.IGNORECASE), 'radius', None),
+
+    # 倒角格式: C + 数字 + 单位
+    (re.compile(r'C\s*(\d+\.?\d*)\s*(mm|cm|inch|in)?', re.IGNORECASE), 'chamfer', ('c',)),
+
+    # 公差格式: 数字 ± 数字 单位
+    (re.compile(r'(\d+\.?\d*)\s*[±]\s*(\d+\.?\d*)\s*(mm|cm|inch|in|°)', re.IGNORECASE), 'tolerance', ('±',)),
+
+    # MAX/MIN格式: 数字 MAX/MIN
+    (re.compile(r'(\d+\.?\d*)\s*(MAX|MIN|max|min)', re.IGNORECASE), 'limit', None),
+
+    # 表面粗糙度: Ra + 数字 + 单位
+    (re.compile(r'Ra\s*(\d+\.?\d*)\s*(um|μm|mm)?', re.IGNORECASE), 'roughness', ('ra',)),
+]
+
+# 所有尺寸格式都至少包含一个数字
+_DIGIT_PATTERN = re.compile(r'\d')
+
+# 响应缓存中保留的字段（不保存context等大字段及耗时统计）
+CACHED_RESPONSE_FIELDS = ("response", "model")
+
+# 优化的尺寸识别提示词 - 支持表格和标注识别
+_DEFAULT_PROMPT = """你是专业的工程图纸分析专家。请识别图像中的所有尺寸标注信息，包括表格中的公差项目。
 
 重要：请严格按照以下JSON格式输出，不要包含任何其他文字或解释！
 
@@ -179,12 +129,9 @@ C. 特别注意：
 dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer, position, roughness, tolerance_spec
 
 请只输出JSON，不要其他内容！"""
-    
-    def _get_enhanced_prompt(self) -> str:
-        """
-        获取增强版提示词 - 专门用于表格检查清单分析
-        """
-        return """你是专业的工程检查清单分析专家。请仔细识别图像中的表格内容，特别是左侧的描述项目。
+
+# 增强版提示词 - 专门用于表格检查清单分析
+_ENHANCED_PROMPT = """你是专业的工程检查清单分析专家。请仔细识别图像中的表格内容，特别是左侧的描述项目。
 
 重点识别以下类型的表格项目：
 
@@ -237,83 +184,449 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
 5. 不要遗漏任何表格行项目
 
 请只输出JSON，不要其他内容！"""
+
+
+# 图像分析的生成参数
+GENERATE_OPTIONS = {
+    "temperature": 0.1,  # 降低随机性，提高准确性
+    "top_p": 0.9,
+    "top_k": 40
+}
+
+
+@functools.lru_cache(maxsize=8)
+def _generate_body_template(model: str, prompt: str, keep_alive: str) -> Tuple[bytes, bytes]:
+    """
+    预序列化 /api/generate 请求体，返回图像base64字符串前后的字节片段
+
+    images 放在最后一个键，序列化结果以 [""]} 结尾，
+    base64只含ASCII字符无需转义，可直接插入两段之间。
+    """
+    body = orjson.dumps({
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "keep_alive": keep_alive,
+        "options": GENERATE_OPTIONS,
+        "images": [""]
+    })
+    return body[:-3], body[-3:]
+
+
+class OllamaService:
+    """Ollama AI模型服务类"""
+    
+    def __init__(self):
+        self.base_url = settings.OLLAMA_BASE_URL
+        self.model = settings.OLLAMA_MODEL
+        self.timeout = 900  # 15分钟超时
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        # 线程池中的多个任务可能同时首次获取同步客户端
+        self._sync_client_lock = threading.Lock()
+        # 模型可用性检查结果缓存
+        self._availability: Optional[bool] = None
+        self._availability_checked_at = 0.0
+        self._availability_lock: Optional[asyncio.Lock] = None
+        # 响应缓存条目计数，超出上限时才扫描缓存目录进行淘汰
+        self._cache_entry_count: Optional[int] = None
+        self._cache_lock = threading.Lock()
+    
+    def _client_options(self) -> Dict[str, Any]:
+        """
+        共享HTTP客户端的连接参数
+        """
+        return {
+            "base_url": self.base_url,
+            "timeout": httpx.Timeout(self.timeout),
+            "limits": httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=40,
+                keepalive_expiry=60
+            ),
+        }
+    
+    def get_client(self) -> httpx.AsyncClient:
+        """
+        获取共享的异步HTTP客户端，复用与Ollama的连接
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(**self._client_options())
+        return self._client
+    
+    def get_sync_client(self) -> httpx.Client:
+        """
+        获取共享的同步HTTP客户端，供线程池中的任务复用连接
+        """
+        with self._sync_client_lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(**self._client_options())
+            return self._sync_client
+    
+    async def aclose(self):
+        """
+        关闭共享的HTTP客户端
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        with self._sync_client_lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+    
+    def get_cached_availability(self) -> Optional[bool]:
+        """
+        获取有效期内的模型可用性检查结果，过期或未检查时返回None
+        """
+        if time.monotonic() - self._availability_checked_at < settings.OLLAMA_AVAILABILITY_TTL:
+            return self._availability
+        return None
+    
+    def record_availability(self, available: bool):
+        """
+        记录模型可用性检查结果
+        """
+        self._availability = available
+        self._availability_checked_at = time.monotonic()
+    
+    async def check_model_availability(self) -> bool:
+        """
+        检查模型是否可用，结果在 OLLAMA_AVAILABILITY_TTL 秒内复用
+        """
+        cached = self.get_cached_availability()
+        if cached is not None:
+            return cached
+        
+        if self._availability_lock is None:
+            self._availability_lock = asyncio.Lock()
+        # 并发检查只向Ollama发送一次请求，其余等待并复用结果
+        async with self._availability_lock:
+            cached = self.get_cached_availability()
+            if cached is not None:
+                return cached
+            available = await self._request_model_availability()
+            self.record_availability(available)
+            return available
+    
+    async def _request_model_availability(self) -> bool:
+        """
+        向Ollama查询模型是否可用
+        """
+        try:
+            client = self.get_client()
+            # 使用 POST 方法检查模型是否可用
+            response = await client.post(
+                "/api/show",
+                content=orjson.dumps({"name": self.model}),
+                headers={"Content-Type": "application/json"},
+                timeout=30
+            )
+            if response.status_code == 200:
+                return True
+            
+            # 如果 show 失败，回退到 tags 方法
+            response = await client.get("/api/tags", timeout=30)
+            if response.status_code == 200:
+                models = orjson.loads(response.content).get("models", [])
+                # 按去掉标签后的模型名匹配
+                model_name = self.model.split(":", 1)[0]
+                names = {model.get("name", "").split(":", 1)[0] for model in models}
+                return model_name in names
+            return False
+        except Exception:
+            return False
+    
+    def encode_image_to_base64(self, image_path: str) -> str:
+        """
+        将图像编码为base64字符串
+        """
+        return self.encode_image_with_digest(image_path)[0].decode("ascii")
+    
+    def encode_image_with_digest(self, image_path: str) -> Tuple[bytes, str]:
+        """
+        将图像编码为base64字节串，同时返回图像内容的SHA256摘要
+        
+        编码结果保持为bytes，可直接拼接进请求体，无需再转换为str。
+        """
+        try:
+            # 分块编码，避免原始图像与编码结果同时完整驻留内存
+            buffer = io.BytesIO()
+            digest = hashlib.sha256()
+            with open(image_path, "rb") as image_file:
+                while chunk := image_file.read(ENCODE_CHUNK_SIZE):
+                    digest.update(chunk)
+                    buffer.write(base64.b64encode(chunk))
+            return buffer.getvalue(), digest.hexdigest()
+        except Exception as e:
+            raise Exception(f"图像编码失败: {str(e)}")
+    
+    def _response_cache_path(self, prompt: str, image_digest: str) -> str:
+        """
+        获取 (模型, 提示词, 图像摘要) 对应的响应缓存文件路径
+        """
+        key = hashlib.blake2b(
+            f"{self.model}|{prompt}|{image_digest}".encode("utf-8"),
+            digest_size=32
+        ).hexdigest()
+        return os.path.join(settings.OLLAMA_CACHE_DIR, f"{key}.json")
+    
+    def load_cached_response(self, prompt: str, image_digest: str) -> Optional[Dict[str, Any]]:
+        """
+        读取已缓存的Ollama生成结果，未命中时返回None
+        """
+        cache_path = self._response_cache_path(prompt, image_digest)
+        try:
+            with open(cache_path, "rb") as f:
+                result = orjson.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        
+        # 更新修改时间，淘汰时按最近使用顺序保留（失败不影响本次命中）
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+        return result
+    
+    def store_cached_response(self, prompt: str, image_digest: str, result: Dict[str, Any]):
+        """
+        缓存Ollama生成结果（先写临时文件再替换，保证写入原子性）
+        
+        只保存后续会读取的字段，缓存目录由应用启动时创建。
+        """
+        cache_path = self._response_cache_path(prompt, image_digest)
+        temp_path = f"{cache_path}.{secrets.token_hex(4)}.tmp"
+        entry = {field: result.get(field, "") for field in CACHED_RESPONSE_FIELDS}
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(orjson.dumps(entry))
+            os.replace(temp_path, cache_path)
+            self._record_cache_write()
+        except Exception as e:
+            logger.warning("⚠️ 写入Ollama响应缓存失败: %s", e)
+    
+    def _record_cache_write(self):
+        """
+        记录一次缓存写入，条目数超过 OLLAMA_CACHE_MAX_ENTRIES 时才扫描目录淘汰
+        """
+        with self._cache_lock:
+            if self._cache_entry_count is None:
+                # 首次写入时统计已有条目
+                self._cache_entry_count = self._evict_cached_responses()
+                return
+            self._cache_entry_count += 1
+            if self._cache_entry_count > settings.OLLAMA_CACHE_MAX_ENTRIES:
+                self._cache_entry_count = self._evict_cached_responses()
+    
+    def _evict_cached_responses(self) -> int:
+        """
+        超出上限时删除最久未使用的条目，保留上限的90%以减少扫描次数
+
+        Returns:
+            淘汰后剩余的条目数
+        """
+        with os.scandir(settings.OLLAMA_CACHE_DIR) as entries:
+            cache_files = [
+                (entry.stat().st_mtime_ns, entry.path)
+                for entry in entries
+                if entry.name.endswith(".json")
+            ]
+        if len(cache_files) <= settings.OLLAMA_CACHE_MAX_ENTRIES:
+            return len(cache_files)
+        
+        keep = settings.OLLAMA_CACHE_MAX_ENTRIES * 9 // 10
+        cache_files.sort()
+        for _, path in cache_files[:len(cache_files) - keep]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return keep
+    
+    def _build_generate_body(self, prompt: str, image_base64: bytes) -> bytes:
+        """
+        拼接 /api/generate 请求体，base64图像字节直接嵌入预序列化的JSON模板
+        """
+        prefix, suffix = _generate_body_template(self.model, prompt, settings.OLLAMA_KEEP_ALIVE)
+        return b"".join((prefix, image_base64, suffix))
+    
+    async def warm_up(self):
+        """
+        预加载模型到Ollama内存，避免首个分析请求承担模型加载耗时
+        """
+        try:
+            client = self.get_client()
+            # 空提示词的生成请求只加载模型，不进行推理
+            response = await client.post(
+                "/api/generate",
+                content=orjson.dumps({
+                    "model": self.model,
+                    "prompt": "",
+                    "stream": False,
+                    "keep_alive": settings.OLLAMA_KEEP_ALIVE
+                }),
+                headers={"Content-Type": "application/json"}
+            )
+            if response.status_code == 200:
+                logger.info("🔥 模型 %s 预加载完成", self.model)
+            else:
+                logger.warning("⚠️ 模型 %s 预加载失败: %s", self.model, response.status_code)
+        except Exception as e:
+            logger.warning("⚠️ 模型 %s 预加载失败: %s", self.model, e)
+    
+    async def analyze_image(self, image_path: str, prompt: str = None) -> Dict[str, Any]:
+        """
+        分析图像并提取尺寸信息
+        """
+        try:
+            # 编码图像
+            image_base64, image_digest = self.encode_image_with_digest(image_path)
+            
+            # 默认提示词
+            if prompt is None:
+                prompt = self._get_default_prompt()
+            
+            # 相同模型、提示词和图像内容直接复用缓存结果（命中时耗时统计为0）
+            result = self.load_cached_response(prompt, image_digest)
+            if result is None:
+                # 发送请求（复用共享连接，请求体由预序列化模板拼接）
+                client = self.get_client()
+                response = await client.post(
+                    "/api/generate",
+                    content=self._build_generate_body(prompt, image_base64),
+                    headers={"Content-Type": "application/json"}
+                )
+                
+                if response.status_code != 200:
+                    raise Exception(f"Ollama API请求失败: {response.status_code}")
+                
+                result = orjson.loads(response.content)
+                self.store_cached_response(prompt, image_digest, result)
+            
+            return {
+                "success": True,
+                "response": result.get("response", ""),
+                "model": result.get("model", ""),
+                "total_duration": result.get("total_duration", 0),
+                "load_duration": result.get("load_duration", 0),
+                "prompt_eval_count": result.get("prompt_eval_count", 0),
+                "eval_count": result.get("eval_count", 0)
+            }
+                
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "response": ""
+            }
+    
+    def _get_default_prompt(self) -> str:
+        """
+        获取优化的尺寸识别提示词 - 支持表格和标注识别
+        """
+        return _DEFAULT_PROMPT
+    
+    def _get_enhanced_prompt(self) -> str:
+        """
+        获取增强版提示词 - 专门用于表格检查清单分析
+        """
+        return _ENHANCED_PROMPT
     
     async def batch_analyze_images(self, image_paths: List[str], prompt: str = None) -> List[Dict[str, Any]]:
         """
         批量分析多个图像
         """
-        results = []
-        for i, image_path in enumerate(image_paths):
+        # 限制同时发往Ollama的请求数量
+        semaphore = asyncio.Semaphore(settings.OLLAMA_CONCURRENCY)
+        
+        async def analyze_page(i: int, image_path: str) -> Dict[str, Any]:
             try:
-                result = await self.analyze_image(image_path, prompt)
+                async with semaphore:
+                    result = await self.analyze_image(image_path, prompt)
                 result["page_number"] = i + 1
                 result["image_path"] = image_path
-                results.append(result)
+                return result
             except Exception as e:
-                results.append({
+                return {
                     "success": False,
                     "error": str(e),
                     "page_number": i + 1,
                     "image_path": image_path
-                })
+                }
         
-        return results
+        # 并发分析所有页面，结果保持页面顺序
+        return await asyncio.gather(
+            *(analyze_page(i, image_path) for i, image_path in enumerate(image_paths))
+        )
     
     def parse_dimensions_from_response(self, response_text: str) -> Dict[str, Any]:
         """
         从AI响应中解析尺寸信息和表格信息 - 增强版
         """
         try:
-            import re
             all_dimensions = []
             all_table_items = []
             
-            print(f"🔍 开始解析AI响应，长度: {len(response_text)}")
+            logger.debug("🔍 开始解析AI响应，长度: %d", len(response_text))
+            
+            # 快速路径: 模型按要求只输出纯JSON时，跳过代码块扫描
+            json_parsed = False
+            stripped_text = response_text.strip()
+            if stripped_text.startswith('{') and stripped_text.endswith('}'):
+                try:
+                    data = orjson.loads(stripped_text)
+                    json_parsed = True
+                    all_dimensions.extend(data.get("dimensions", []))
+                    all_table_items.extend(data.get("table_items", []))
+                    logger.debug("✅ 纯JSON解析成功，找到 %d 个尺寸标注, %d 个表格项目", len(all_dimensions), len(all_table_items))
+                except orjson.JSONDecodeError:
+                    pass
             
             # 方法1: 提取markdown格式的JSON代码块
-            json_blocks = re.findall(r'```json\s*(\{.*?\})\s*```', response_text, re.DOTALL | re.IGNORECASE)
-            print(f"📄 找到 {len(json_blocks)} 个JSON代码块")
+            json_blocks = [] if json_parsed else _JSON_BLOCK_PATTERN.findall(response_text)
+            logger.debug("📄 找到 %d 个JSON代码块", len(json_blocks))
             
             for i, block in enumerate(json_blocks):
                 try:
-                    print(f"🔄 解析第 {i+1} 个JSON代码块...")
-                    data = json.loads(block)
+                    logger.debug("🔄 解析第 %d 个JSON代码块...", i + 1)
+                    data = orjson.loads(block)
                     dimensions = data.get("dimensions", [])
                     table_items = data.get("table_items", [])
-                    print(f"✅ 成功解析出 {len(dimensions)} 个尺寸标注, {len(table_items)} 个表格项目")
+                    logger.debug("✅ 成功解析出 %d 个尺寸标注, %d 个表格项目", len(dimensions), len(table_items))
                     all_dimensions.extend(dimensions)
                     all_table_items.extend(table_items)
-                except json.JSONDecodeError as e:
-                    print(f"❌ JSON解析失败: {str(e)}")
+                except orjson.JSONDecodeError as e:
+                    logger.debug("❌ JSON解析失败: %s", e)
                     continue
             
             # 方法2: 尝试直接解析纯JSON（去除markdown标记）
-            if not all_dimensions and not all_table_items:
-                print("🔄 尝试直接JSON解析...")
+            if not json_parsed and not all_dimensions and not all_table_items:
+                logger.debug("🔄 尝试直接JSON解析...")
                 # 清理响应文本
                 cleaned_text = response_text.strip()
                 # 移除可能的markdown标记
-                cleaned_text = re.sub(r'^```json\s*', '', cleaned_text, flags=re.MULTILINE)
-                cleaned_text = re.sub(r'\s*```$', '', cleaned_text, flags=re.MULTILINE)
+                cleaned_text = _JSON_FENCE_START_PATTERN.sub('', cleaned_text)
+                cleaned_text = _JSON_FENCE_END_PATTERN.sub('', cleaned_text)
                 
                 if cleaned_text.startswith('{'):
                     try:
-                        data = json.loads(cleaned_text)
+                        data = orjson.loads(cleaned_text)
                         dimensions = data.get("dimensions", [])
                         table_items = data.get("table_items", [])
-                        print(f"✅ 直接JSON解析成功，找到 {len(dimensions)} 个尺寸标注, {len(table_items)} 个表格项目")
+                        logger.debug("✅ 直接JSON解析成功，找到 %d 个尺寸标注, %d 个表格项目", len(dimensions), len(table_items))
                         all_dimensions.extend(dimensions)
                         all_table_items.extend(table_items)
-                    except json.JSONDecodeError as e:
-                        print(f"❌ 直接JSON解析失败: {str(e)}")
+                    except orjson.JSONDecodeError as e:
+                        logger.debug("❌ 直接JSON解析失败: %s", e)
             
             # 方法3: 增强的正则表达式回退解析（仅用于尺寸）
             if not all_dimensions:
-                print("🔄 使用增强正则表达式解析尺寸...")
+                logger.debug("🔄 使用增强正则表达式解析尺寸...")
                 all_dimensions = self._extract_dimensions_with_enhanced_regex(response_text)
-                print(f"📊 正则表达式解析找到 {len(all_dimensions)} 个尺寸")
+                logger.debug("📊 正则表达式解析找到 %d 个尺寸", len(all_dimensions))
             
-            print(f"🎉 总共解析出 {len(all_dimensions)} 个尺寸标注, {len(all_table_items)} 个表格项目")
+            logger.debug("🎉 总共解析出 %d 个尺寸标注, %d 个表格项目", len(all_dimensions), len(all_table_items))
             
             return {
                 "dimensions": all_dimensions,
@@ -322,7 +635,7 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
             }
             
         except Exception as e:
-            print(f"❌ 解析信息失败: {str(e)}")
+            logger.warning("❌ 解析信息失败: %s", e)
             return {
                 "dimensions": [],
                 "table_items": [],
@@ -333,43 +646,35 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
         """
         增强的正则表达式尺寸提取
         """
-        import re
         dimensions = []
+        # 按 (数值, 单位, 公差) 在生成时去重
+        seen = set()
         
-        # 多种尺寸格式的正则表达式
-        patterns = [
-            # 基本格式: 数字 + 单位 + 可选公差
-            (r'(\d+\.?\d*)\s*(mm|cm|inch|in|″|′|°|um)\s*([±]\s*\d+\.?\d*)?', 'basic'),
-            
-            # 直径格式: Φ + 数字 + 单位
-            (r'[ΦΦφ]\s*(\d+\.?\d*)\s*(mm|cm|inch|in)?', 'diameter'),
-            
-            # 半径格式: R + 数字 + 单位  
-            (r'R\s*(\d+\.?\d*)\s*(mm|cm|inch|in)?', 'radius'),
-            
-            # 倒角格式: C + 数字 + 单位
-            (r'C\s*(\d+\.?\d*)\s*(mm|cm|inch|in)?', 'chamfer'),
-            
-            # 公差格式: 数字 ± 数字 单位
-            (r'(\d+\.?\d*)\s*[±]\s*(\d+\.?\d*)\s*(mm|cm|inch|in|°)', 'tolerance'),
-            
-            # MAX/MIN格式: 数字 MAX/MIN
-            (r'(\d+\.?\d*)\s*(MAX|MIN|max|min)', 'limit'),
-            
-            # 表面粗糙度: Ra + 数字 + 单位
-            (r'Ra\s*(\d+\.?\d*)\s*(um|μm|mm)?', 'roughness'),
-        ]
+        # 没有任何数字时不可能匹配任何尺寸格式
+        if not _DIGIT_PATTERN.search(text):
+            return dimensions
         
-        for pattern, dim_type in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        lowered = text.lower()
+        for pattern, dim_type, required in _DIMENSION_PATTERNS:
+            # 文本中缺少该格式的必需字符时跳过整次扫描
+            if required and not any(literal in lowered for literal in required):
+                continue
+            
+            matches = pattern.findall(text)
             
             for match in matches:
                 if dim_type == 'basic':
                     value, unit, tolerance = match
+                    unit = unit.lower() if unit else "mm"
+                    tolerance = tolerance.strip() if tolerance else None
+                    key = (value, unit, tolerance)
+                    if key in seen:
+                        continue
+                    seen.add(key)
                     dimensions.append({
                         "value": value,
-                        "unit": unit.lower() if unit else "mm",
-                        "tolerance": tolerance.strip() if tolerance else None,
+                        "unit": unit,
+                        "tolerance": tolerance,
                         "dimension_type": "linear",
                         "prefix": None,
                         "position": {"x": 0, "y": 0},
@@ -379,9 +684,14 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
                     
                 elif dim_type == 'diameter':
                     value, unit = match
+                    unit = unit.lower() if unit else "mm"
+                    key = (value, unit, None)
+                    if key in seen:
+                        continue
+                    seen.add(key)
                     dimensions.append({
                         "value": value,
-                        "unit": unit.lower() if unit else "mm",
+                        "unit": unit,
                         "tolerance": None,
                         "dimension_type": "diameter", 
                         "prefix": "Φ",
@@ -392,9 +702,14 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
                     
                 elif dim_type == 'radius':
                     value, unit = match
+                    unit = unit.lower() if unit else "mm"
+                    key = (value, unit, None)
+                    if key in seen:
+                        continue
+                    seen.add(key)
                     dimensions.append({
                         "value": value,
-                        "unit": unit.lower() if unit else "mm",
+                        "unit": unit,
                         "tolerance": None,
                         "dimension_type": "radius",
                         "prefix": "R", 
@@ -405,10 +720,16 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
                     
                 elif dim_type == 'tolerance':
                     value, tolerance_val, unit = match
+                    unit = unit.lower()
+                    tolerance = f"±{tolerance_val}"
+                    key = (value, unit, tolerance)
+                    if key in seen:
+                        continue
+                    seen.add(key)
                     dimensions.append({
                         "value": value,
-                        "unit": unit.lower(),
-                        "tolerance": f"±{tolerance_val}",
+                        "unit": unit,
+                        "tolerance": tolerance,
                         "dimension_type": "linear",
                         "prefix": None,
                         "position": {"x": 0, "y": 0},
@@ -418,10 +739,15 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
                     
                 elif dim_type == 'limit':
                     value, limit_type = match
+                    tolerance = limit_type.upper()
+                    key = (value, "mm", tolerance)
+                    if key in seen:
+                        continue
+                    seen.add(key)
                     dimensions.append({
                         "value": value,
                         "unit": "mm",
-                        "tolerance": limit_type.upper(),
+                        "tolerance": tolerance,
                         "dimension_type": "linear",
                         "prefix": None,
                         "position": {"x": 0, "y": 0},
@@ -429,13 +755,4 @@ dimension_type选项：linear, angular, diameter, radius, thread, hole, chamfer,
                         "description": f"正则提取-{limit_type.lower()}值"
                     })
         
-        # 去重处理
-        unique_dimensions = []
-        seen = set()
-        for dim in dimensions:
-            key = f"{dim['value']}-{dim['unit']}-{dim.get('tolerance', '')}"
-            if key not in seen:
-                seen.add(key)
-                unique_dimensions.append(dim)
-        
-        return unique_dimensions
+        return dimensions
@@ -2,12 +2,42 @@
 PDF处理服务
 """
 
+import logging
 import fitz  # PyMuPDF
-from PIL import Image
+from PIL import Image, ImageEnhance, ImageFilter
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Tuple
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+def _enhance_light(gray):
+    """
+    轻度增强：仅对比度调整
+    """
+    import cv2
+    return cv2.convertScaleAbs(gray, alpha=1.2, beta=10)
+
+
+def _enhance_medium(gray):
+    """
+    中度增强：对比度 + 锐化
+    """
+    import cv2
+    import numpy as np
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+    enhanced = clahe.apply(gray)
+    kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+    return cv2.filter2D(enhanced, -1, kernel)
+
+
+# 增强级别到处理函数的映射 ("strong" 使用完整的工程图纸增强流程)
+_ENHANCEMENT_FUNCTIONS = {
+    "light": _enhance_light,
+    "medium": _enhance_medium,
+}
+
 
 class PDFService:
     """PDF处理服务类"""
@@ -21,19 +51,8 @@ class PDFService:
         获取PDF基本信息
         """
         try:
-            doc = fitz.open(pdf_path)
-            info = {
-                "page_count": len(doc),
-                "title": doc.metadata.get("title", ""),
-                "author": doc.metadata.get("author", ""),
-                "subject": doc.metadata.get("subject", ""),
-                "creator": doc.metadata.get("creator", ""),
-                "producer": doc.metadata.get("producer", ""),
-                "creation_date": doc.metadata.get("creationDate", ""),
-                "modification_date": doc.metadata.get("modDate", ""),
-            }
-            doc.close()
-            return info
+            with fitz.open(pdf_path) as doc:
+                return self._read_pdf_info(doc)
         except Exception as e:
             raise Exception(f"获取PDF信息失败: {str(e)}")
     
@@ -42,34 +61,64 @@ class PDFService:
         使用PyMuPDF将PDF页面转换为图像
         """
         try:
-            import fitz  # PyMuPDF
-            
-            # 确保输出目录存在
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 获取PDF信息
-            pdf_info = self.get_pdf_info(pdf_path)
-            page_count = min(pdf_info["page_count"], self.max_pages)
-            
-            image_paths = []
-            doc = fitz.open(pdf_path)
-            
-            for page_num in range(page_count):
-                page = doc[page_num]
-                # 渲染页面为图像
-                mat = fitz.Matrix(self.dpi/72, self.dpi/72)  # DPI转换
-                pix = page.get_pixmap(matrix=mat)
-                
-                image_path = os.path.join(output_dir, f"page_{page_num + 1}.png")
-                pix.save(image_path)
-                image_paths.append(image_path)
-            
-            doc.close()
-            return image_paths
-            
+            with fitz.open(pdf_path) as doc:
+                return self._render_pages(doc, output_dir)
         except Exception as e:
             raise Exception(f"PDF转图像失败: {str(e)}")
     
+    def load_pdf(self, pdf_path: str, output_dir: str) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        只打开一次PDF，同时获取基本信息并将页面转换为图像
+        
+        Returns:
+            (PDF基本信息, 页面图像路径列表)
+        """
+        try:
+            with fitz.open(pdf_path) as doc:
+                info = self._read_pdf_info(doc)
+                image_paths = self._render_pages(doc, output_dir)
+            return info, image_paths
+        except Exception as e:
+            raise Exception(f"PDF处理失败: {str(e)}")
+    
+    def _read_pdf_info(self, doc) -> Dict[str, Any]:
+        """
+        从已打开的文档读取基本信息
+        """
+        metadata = doc.metadata
+        return {
+            "page_count": len(doc),
+            "title": metadata.get("title", ""),
+            "author": metadata.get("author", ""),
+            "subject": metadata.get("subject", ""),
+            "creator": metadata.get("creator", ""),
+            "producer": metadata.get("producer", ""),
+            "creation_date": metadata.get("creationDate", ""),
+            "modification_date": metadata.get("modDate", ""),
+        }
+    
+    def _render_pages(self, doc, output_dir: str) -> List[str]:
+        """
+        将已打开文档的页面渲染为PNG图像
+        """
+        # 确保输出目录存在
+        os.makedirs(output_dir, exist_ok=True)
+        
+        page_count = min(len(doc), self.max_pages)
+        image_paths = []
+        mat = fitz.Matrix(self.dpi/72, self.dpi/72)  # DPI转换
+        
+        for page_num in range(page_count):
+            page = doc[page_num]
+            # 渲染页面为图像
+            pix = page.get_pixmap(matrix=mat)
+            
+            image_path = os.path.join(output_dir, f"page_{page_num + 1}.png")
+            pix.save(image_path)
+            image_paths.append(image_path)
+        
+        return image_paths
+    
     def extract_text_from_page(self, pdf_path: str, page_number: int) -> str:
         """
         从指定页面提取文本
@@ -153,17 +202,17 @@ class PDFService:
                 _ = np.array([1, 2, 3])
                 _ = cv2.__version__
             except (ImportError, AttributeError, Exception) as e:
-                print(f"⚠️ OpenCV/NumPy导入或初始化失败，使用基础图像处理: {str(e)}")
+                logger.warning("⚠️ OpenCV/NumPy导入或初始化失败，使用基础图像处理: %s", e)
                 return self._basic_image_enhancement(image_path, output_path)
             
-            print(f"🖼️ 开始增强工程图纸: {image_path}")
+            logger.debug("🖼️ 开始增强工程图纸: %s", image_path)
             
             # 读取图像
             img = cv2.imread(image_path)
             if img is None:
                 raise Exception(f"无法读取图像: {image_path}")
             
-            print(f"📏 原始图像尺寸: {img.shape}")
+            logger.debug("📏 原始图像尺寸: %s", img.shape)
             
             # 转换为灰度图
             if len(img.shape) == 3:
@@ -172,16 +221,16 @@ class PDFService:
                 gray = img
             
             # 1. 自适应直方图均衡化 - 增强对比度
-            print("🔧 应用自适应直方图均衡化...")
+            logger.debug("🔧 应用自适应直方图均衡化...")
             clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
             enhanced = clahe.apply(gray)
             
             # 2. 双边滤波 - 去噪但保留边缘
-            print("🔧 应用双边滤波去噪...")
+            logger.debug("🔧 应用双边滤波去噪...")
             denoised = cv2.bilateralFilter(enhanced, 9, 75, 75)
             
             # 3. 锐化滤波 - 增强文字和线条清晰度
-            print("🔧 应用锐化滤波...")
+            logger.debug("🔧 应用锐化滤波...")
             kernel_sharpen = np.array([
                 [-1, -1, -1],
                 [-1,  9, -1], 
@@ -190,7 +239,7 @@ class PDFService:
             sharpened = cv2.filter2D(denoised, -1, kernel_sharpen)
             
             # 4. 形态学操作 - 增强细线条
-            print("🔧 应用形态学操作...")
+            logger.debug("🔧 应用形态学操作...")
             kernel_morph = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 1))
             morphed = cv2.morphologyEx(sharpened, cv2.MORPH_CLOSE, kernel_morph)
             
@@ -198,7 +247,7 @@ class PDFService:
             # 先检查图像是否适合二值化
             mean_intensity = np.mean(morphed)
             if mean_intensity > 200:  # 背景较亮的图纸
-                print("🔧 应用自适应二值化...")
+                logger.debug("🔧 应用自适应二值化...")
                 # 使用自适应阈值
                 binary = cv2.adaptiveThreshold(
                     morphed, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
@@ -209,7 +258,7 @@ class PDFService:
                 final_image = morphed
             
             # 6. 可选：边缘增强
-            print("🔧 应用边缘增强...")
+            logger.debug("🔧 应用边缘增强...")
             edges = cv2.Canny(final_image, 50, 150)
             # 将边缘信息融合回原图
             final_image = cv2.addWeighted(final_image, 0.8, edges, 0.2, 0)
@@ -222,11 +271,11 @@ class PDFService:
             if not success:
                 raise Exception("保存增强图像失败")
             
-            print(f"✅ 图像增强完成: {output_path}")
+            logger.debug("✅ 图像增强完成: %s", output_path)
             return output_path
             
         except Exception as e:
-            print(f"❌ 工程图纸增强失败: {str(e)}")
+            logger.warning("❌ 工程图纸增强失败: %s", e)
             # 如果增强失败，返回原图像路径
             return image_path
     
@@ -239,8 +288,15 @@ class PDFService:
             enhancement_level: 增强级别 ("light", "medium", "strong")
         """
         try:
+            if enhancement_level == "strong":
+                # 强度增强：全套处理
+                return self.enhance_for_engineering_drawing(image_path)
+            
+            enhance = _ENHANCEMENT_FUNCTIONS.get(enhancement_level)
+            if enhance is None:
+                raise ValueError(f"不支持的增强级别: {enhancement_level}")
+            
             import cv2
-            import numpy as np
             
             img = cv2.imread(image_path)
             if img is None:
@@ -248,21 +304,7 @@ class PDFService:
             
             # 转为灰度
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if len(img.shape) == 3 else img
-            
-            if enhancement_level == "light":
-                # 轻度增强：仅对比度调整
-                enhanced = cv2.convertScaleAbs(gray, alpha=1.2, beta=10)
-                
-            elif enhancement_level == "medium":
-                # 中度增强：对比度 + 锐化
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-                enhanced = clahe.apply(gray)
-                kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-                enhanced = cv2.filter2D(enhanced, -1, kernel)
-                
-            elif enhancement_level == "strong":
-                # 强度增强：全套处理
-                return self.enhance_for_engineering_drawing(image_path)
+            enhanced = enhance(gray)
             
             # 保存结果
             output_path = image_path.replace('.png', f'_enhanced_{enhancement_level}.png')
@@ -270,7 +312,7 @@ class PDFService:
             return output_path
             
         except Exception as e:
-            print(f"图像增强失败: {str(e)}")
+            logger.warning("图像增强失败: %s", e)
             return image_path
     
     def _basic_image_enhancement(self, image_path: str, output_path: str = None) -> str:
@@ -278,9 +320,7 @@ class PDFService:
         基础图像增强 - 不依赖OpenCV的回退方案
         """
         try:
-            from PIL import Image, ImageEnhance, ImageFilter
-            
-            print(f"🖼️ 使用基础方法增强图像: {image_path}")
+            logger.debug("🖼️ 使用基础方法增强图像: %s", image_path)
             
             # 打开图像
             image = Image.open(image_path)
@@ -309,12 +349,12 @@ class PDFService:
                 output_path = image_path.replace('.png', '_enhanced.png')
             
             image.save(output_path, 'PNG', quality=95)
-            print(f"✅ 基础图像增强完成: {output_path}")
+            logger.debug("✅ 基础图像增强完成: %s", output_path)
             
             return output_path
             
         except Exception as e:
-            print(f"❌ 基础图像增强失败: {str(e)}")
+            logger.warning("❌ 基础图像增强失败: %s", e)
             return image_path
     
     def cleanup_temp_files(self, file_paths: List[str]):
@@ -323,7 +363,8 @@ class PDFService:
         """
         for file_path in file_paths:
             try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
             except Exception as e:
-                print(f"清理文件失败 {file_path}: {str(e)}")
+                logger.warning("清理文件失败 %s: %s", file_path, e)
@@ -6,123 +6,154 @@ from app.services.pdf_service import PDFService
 from app.services.ollama_service import OllamaService
 from app.core.config import settings
 import os
-import json
+import logging
+import shutil
+import functools
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any
 
+logger = logging.getLogger(__name__)
 
-def process_pdf_task(file_id: str, pdf_path: str) -> Dict[str, Any]:
+# 服务实例在各次任务间复用
+pdf_service = PDFService()
+ollama_service = OllamaService()
+
+# 图像增强线程池，由所有任务共享，总线程数不随并发任务数增长
+_enhance_executor = ThreadPoolExecutor(
+    max_workers=settings.ENHANCE_MAX_WORKERS,
+    thread_name_prefix="enhance"
+)
+
+
+# 页面分析线程池，由所有任务共享，限制同时发往Ollama的请求数
+_analysis_executor = ThreadPoolExecutor(
+    max_workers=settings.OLLAMA_CONCURRENCY,
+    thread_name_prefix="ollama"
+)
+
+
+def shutdown_executors():
     """
-    处理PDF文件的主任务
+    关闭任务使用的线程池
     """
-    try:
-        print(f"🚀 开始处理PDF文件: {pdf_path}")
-        print(f"📄 文件ID: {file_id}")
+    _enhance_executor.shutdown(wait=False, cancel_futures=True)
+    _analysis_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _analyze_page(
+    client,
+    total_pages: int,
+    page_number: int,
+    image_path: str,
+    enhanced_image_path: str
+) -> Dict[str, Any]:
+    """
+    分析单个页面：编码增强图像、查询缓存或请求Ollama，并解析尺寸信息
+    """
+    logger.debug("📄 分析第 %d/%d 页: %s", page_number, total_pages, image_path)
+    
+    # 编码增强后的图像
+    image_base64, image_digest = ollama_service.encode_image_with_digest(enhanced_image_path)
+    logger.debug("📸 增强图像编码完成，大小: %d 字节", len(image_base64))
+    
+    # 相同图像内容直接复用缓存的分析结果
+    prompt = ollama_service._get_default_prompt()
+    result = ollama_service.load_cached_response(prompt, image_digest)
+    if result is not None:
+        logger.debug("♻️ 第 %d 页命中Ollama响应缓存", page_number)
+    else:
+        logger.debug("🤖 发送请求到Ollama: %s", ollama_service.base_url)
         
-        # 创建服务实例
-        pdf_service = PDFService()
+        # 发送请求到Ollama（复用共享连接，请求体由预序列化模板拼接）
+        response = client.post(
+            "/api/generate",
+            content=ollama_service._build_generate_body(prompt, image_base64),
+            headers={"Content-Type": "application/json"}
+        )
         
-        # 获取PDF信息
-        pdf_info = pdf_service.get_pdf_info(pdf_path)
-        page_count = pdf_info["page_count"]
-        print(f"📊 PDF包含 {page_count} 页")
+        if response.status_code != 200:
+            raise Exception(f"Ollama API请求失败: {response.status_code}")
         
+        result = orjson.loads(response.content)
+        ollama_service.store_cached_response(prompt, image_digest, result)
+    
+    logger.debug("✅ 第 %d 页分析成功，响应长度: %d", page_number, len(result.get("response", "")))
+    
+    # 解析尺寸和表格信息
+    parsed_data = ollama_service.parse_dimensions_from_response(
+        result.get("response", "")
+    )
+    
+    return {
+        "success": True,
+        "model": result.get("model", ""),
+        "parsed_dimensions": parsed_data.get("dimensions", []),
+        "parsed_table_items": parsed_data.get("table_items", []),
+        "page_number": page_number,
+        "image_path": image_path
+    }
+
 
+def process_pdf_task(file_id: str, pdf_path: str) -> Dict[str, Any]:
+    """
+    处理PDF文件的主任务
+    """
+    try:
+        logger.info("🚀 开始处理PDF文件: %s", pdf_path)
+        logger.info("📄 文件ID: %s", file_id)
         
-        # 创建输出目录
+        # 输出目录在渲染页面时创建
         output_dir = os.path.join(settings.UPLOAD_DIR, "images", file_id)
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 转换PDF为图像
-        print(f"🔄 开始转换PDF为图像...")
-        image_paths = pdf_service.convert_pdf_to_images(pdf_path, output_dir)
-        print(f"✅ 图像转换完成，生成 {len(image_paths)} 张图像")
         
-
+        # 打开一次PDF，获取信息并转换为图像
+        logger.info("🔄 开始转换PDF为图像...")
+        pdf_info, image_paths = pdf_service.load_pdf(pdf_path, output_dir)
+        logger.info("📊 PDF包含 %d 页", pdf_info["page_count"])
+        logger.info("✅ 图像转换完成，生成 %d 张图像", len(image_paths))
         
         # 直接调用AI分析，不使用Celery
-        print(f"🚀 开始直接调用AI分析...")
+        logger.info("🚀 开始直接调用AI分析...")
         
         try:
-            # 创建Ollama服务实例
-            ollama_service = OllamaService()
-            
             # 检查模型可用性
-            print(f"🔍 检查Ollama模型: {ollama_service.model}")
-            import httpx
-            with httpx.Client(timeout=120) as client:
+            logger.info("🔍 检查Ollama模型: %s", ollama_service.model)
+            client = ollama_service.get_sync_client()
+            # 有效期内已确认可用时跳过 /api/show 请求
+            if ollama_service.get_cached_availability() is not True:
                 response = client.post(
-                    f"{ollama_service.base_url}/api/show",
-                    json={"name": ollama_service.model}
+                    "/api/show",
+                    content=orjson.dumps({"name": ollama_service.model}),
+                    headers={"Content-Type": "application/json"},
+                    timeout=120
                 )
                 if response.status_code != 200:
                     raise Exception(f"Ollama模型不可用: {response.status_code}")
-                print(f"✅ 模型 {ollama_service.model} 可用")
+                ollama_service.record_availability(True)
+            logger.info("✅ 模型 %s 可用", ollama_service.model)
             
-            # 开始分析图像
-            print(f"🚀 开始分析 {len(image_paths)} 张图像...")
-            results = []
+            # 并行增强所有页面图像 (OpenCV处理期间释放GIL)
+            logger.info("🖼️ 开始图像增强处理...")
+            enhanced_image_paths = list(
+                _enhance_executor.map(pdf_service.enhance_for_engineering_drawing, image_paths)
+            )
+            logger.info("✅ 图像增强完成，共 %d 张", len(enhanced_image_paths))
             
-            for i, image_path in enumerate(image_paths):
-                print(f"📄 分析第 {i+1}/{len(image_paths)} 页: {image_path}")
-                
-                # 图像增强处理
-                print(f"🖼️ 开始图像增强处理...")
-                enhanced_image_path = pdf_service.enhance_for_engineering_drawing(image_path)
-                print(f"✅ 图像增强完成: {enhanced_image_path}")
-                
-                # 编码增强后的图像
-                image_base64 = ollama_service.encode_image_to_base64(enhanced_image_path)
-                print(f"📸 增强图像编码完成，大小: {len(image_base64)} 字符")
-                
-                # 构建请求数据
-                request_data = {
-                    "model": ollama_service.model,
-                    "prompt": ollama_service._get_default_prompt(),
-                    "images": [image_base64],
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                        "top_p": 0.9,
-                        "top_k": 40
-                    }
-                }
-                
-                print(f"🤖 发送请求到Ollama: {ollama_service.base_url}")
-                
-                # 发送请求到Ollama
-                with httpx.Client(timeout=ollama_service.timeout) as client:
-                    response = client.post(
-                        f"{ollama_service.base_url}/api/generate",
-                        json=request_data,
-                        headers={"Content-Type": "application/json"}
-                    )
-                    
-                    if response.status_code != 200:
-                        raise Exception(f"Ollama API请求失败: {response.status_code}")
-                    
-                    result = response.json()
-                    print(f"✅ 第 {i+1} 页分析成功，响应长度: {len(result.get('response', ''))}")
-                    
-                    # 解析尺寸和表格信息
-                    parsed_data = ollama_service.parse_dimensions_from_response(
-                        result.get("response", "")
-                    )
-                    
-                    results.append({
-                        "success": True,
-                        "model": result.get("model", ""),
-                        "parsed_dimensions": parsed_data.get("dimensions", []),
-                        "parsed_table_items": parsed_data.get("table_items", []),
-                        "page_number": i + 1,
-                        "image_path": image_path
-                    })
+            # 并发分析所有页面，结果保持页面顺序
+            logger.info("🚀 开始分析 %d 张图像...", len(image_paths))
+            total_pages = len(image_paths)
+            analyze_page = functools.partial(_analyze_page, client, total_pages)
+            results = list(_analysis_executor.map(
+                analyze_page,
+                range(1, total_pages + 1),
+                image_paths,
+                enhanced_image_paths
+            ))
             
             # 整理最终结果
             total_dimensions = sum(len(r.get("parsed_dimensions", [])) for r in results)
             total_table_items = sum(len(r.get("parsed_table_items", [])) for r in results)
-            print(f"✅ AI分析完成，共找到 {total_dimensions} 个尺寸标注, {total_table_items} 个表格项目")
-            
-            print(f"🎉 AI分析完成！")
+            logger.info("✅ AI分析完成，共找到 %d 个尺寸标注, %d 个表格项目", total_dimensions, total_table_items)
             
 
             
@@ -148,15 +179,15 @@ def process_pdf_task(file_id: str, pdf_path: str) -> Dict[str, Any]:
                 "message": "PDF处理和AI分析全部完成"
             }
             
-            # 输出完整的JSON结果到控制台
-            print("=" * 80)
-            print("📊 完整分析结果JSON:")
-            print("=" * 80)
-            print(json.dumps(result, ensure_ascii=False, indent=2))
-            print("=" * 80)
+            # DEBUG模式下输出完整的JSON结果
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "📊 完整分析结果JSON:\n%s",
+                    orjson.dumps(result, option=orjson.OPT_INDENT_2).decode()
+                )
             
         except Exception as e:
-            print(f"❌ AI分析失败: {e}")
+            logger.error("❌ AI分析失败: %s", e)
             # 如果AI分析失败，返回部分结果
             result = {
                 "file_id": file_id,
@@ -171,23 +202,20 @@ def process_pdf_task(file_id: str, pdf_path: str) -> Dict[str, Any]:
             }
             
             # 即使失败也输出JSON结果
-            print("=" * 80)
-            print("📊 分析结果JSON (部分失败):")
-            print("=" * 80)
-            print(json.dumps(result, ensure_ascii=False, indent=2))
-            print("=" * 80)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "📊 分析结果JSON (部分失败):\n%s",
+                    orjson.dumps(result, option=orjson.OPT_INDENT_2).decode()
+                )
         
         return result
         
     except Exception as e:
-        # 清理临时文件
-        try:
-            if 'image_paths' in locals():
-                pdf_service.cleanup_temp_files(image_paths)
-        except:
-            pass
+        # 清理已生成的页面图像及输出目录
+        if 'output_dir' in locals():
+            shutil.rmtree(output_dir, ignore_errors=True)
         
-        print(f"❌ PDF处理失败: {e}")
+        logger.error("❌ PDF处理失败: %s", e)
         raise
 
 
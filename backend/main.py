@@ -2,10 +2,40 @@
 PDF图纸尺寸分析系统 - 主应用入口
 """
 
+import os
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.logging_config import setup_logging
 from app.api.routes import api_router
+from app.tasks.pdf_tasks import ollama_service, shutdown_executors
+
+# 配置应用日志
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期管理"""
+    # 启动时创建各存储目录（只需创建最深层目录，上级目录随之创建）
+    for directory in (
+        os.path.join(settings.UPLOAD_DIR, "images"),
+        settings.OLLAMA_CACHE_DIR,
+    ):
+        os.makedirs(directory, exist_ok=True)
+    # 后台预加载模型，不阻塞应用启动
+    warm_up_task = None
+    if settings.OLLAMA_WARMUP:
+        warm_up_task = asyncio.create_task(ollama_service.warm_up())
+    yield
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    # 关闭时释放与Ollama的共享连接及任务线程池
+    await ollama_service.aclose()
+    shutdown_executors()
+
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -13,7 +43,8 @@ app = FastAPI(
     description="基于Qwen2.5-VL的PDF图纸尺寸识别与分析系统",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # 配置CORS中间件
@@ -9,6 +9,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.services.ollama_service import OllamaService
 from app.services.pdf_service import PDFService
+from app.core.logging_config import setup_logging
 
 def test_json_parsing():
     """测试JSON解析修复"""
@@ -119,14 +120,77 @@ def test_image_enhancement():
     print("⚠️ 没有找到合适的测试图像")
     return True
 
+def test_result_cache():
+    """测试分析结果缓存 (命中、未命中、淘汰及结果复用)"""
+    print("\n🧪 测试分析结果缓存...")
+    
+    import tempfile
+    from app.core.config import settings
+    from app.api.endpoints import upload
+    
+    original_upload_dir = settings.UPLOAD_DIR
+    original_cache_size = settings.RESULT_CACHE_SIZE
+    upload._result_cache.clear()
+    try:
+        settings.UPLOAD_DIR = tempfile.mkdtemp()
+        settings.RESULT_CACHE_SIZE = 2
+        
+        # 未命中
+        if upload._get_cached_result(("a", "m", 300)) is not None:
+            print("❌ 空缓存不应命中")
+            return False
+        
+        # 模拟首次上传的分析结果
+        old_dir = os.path.join(settings.UPLOAD_DIR, "images", "old")
+        os.makedirs(old_dir)
+        old_image = os.path.join(old_dir, "page_1.png")
+        with open(old_image, "wb") as f:
+            f.write(b"png")
+        cached = {
+            "file_id": "old",
+            "image_paths": [old_image],
+            "ai_analysis": {"page_results": [{"image_path": old_image}]},
+        }
+        upload._store_cached_result(("a", "m", 300), cached)
+        
+        # 命中后复用结果，但 file_id 和图像路径属于本次上传
+        hit = upload._get_cached_result(("a", "m", 300))
+        result = upload._clone_cached_result(hit, "new")
+        new_image = result["image_paths"][0]
+        print(f"✅ 命中缓存，新图像路径: {new_image}")
+        if (result["file_id"] != "new" or "new" not in new_image
+                or result["ai_analysis"]["page_results"][0]["image_path"] != new_image
+                or not os.path.exists(new_image) or cached["file_id"] != "old"):
+            print("❌ 复用结果未指向本次上传")
+            return False
+        
+        # 超出容量时淘汰最久未使用的结果
+        upload._store_cached_result(("b", "m", 300), {})
+        upload._get_cached_result(("a", "m", 300))
+        upload._store_cached_result(("c", "m", 300), {})
+        if upload._get_cached_result(("b", "m", 300)) is not None:
+            print("❌ 最久未使用的结果未被淘汰")
+            return False
+        if upload._get_cached_result(("a", "m", 300)) is None:
+            print("❌ 最近使用的结果被错误淘汰")
+            return False
+        print("✅ 缓存淘汰正常")
+        return True
+    finally:
+        settings.UPLOAD_DIR = original_upload_dir
+        settings.RESULT_CACHE_SIZE = original_cache_size
+        upload._result_cache.clear()
+
 def main():
     """主测试函数"""
+    setup_logging()
     print("🚀 开始测试修复效果...\n")
     
     tests = [
         ("JSON解析修复", test_json_parsing),
         ("正则表达式回退", test_regex_fallback), 
         ("图像增强功能", test_image_enhancement),
+        ("分析结果缓存", test_result_cache),
     ]
     
     results = []